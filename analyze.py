@@ -1,27 +1,45 @@
 # analyze.py
+import argparse
+import os
 import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
 from parser import parse_xml
 from report import generate_report
 
+# Windows 下 ProcessPoolExecutor 的 max_workers 上限
+_WIN_MAX_WORKERS = 61
 
-def process_one(xml_path: Path, reports_dir: Path):
-    """处理单个 XML，生成对应 HTML 报告"""
+
+def process_one(xml_path: Path, reports_dir: Path, compress: bool = False):
+    """处理单个 XML，生成对应 HTML 报告（compress=True 时输出 .html.gz）"""
     if not xml_path.exists():
         print(f"❌ 文件不存在: {xml_path}")
         return
 
-    out_html = reports_dir / f"{xml_path.stem}.html"
+    out_html = reports_dir / f"{xml_path.stem}.html{'.gz' if compress else ''}"
     if out_html.exists():
-        print(f"⏩ 已存在报告，跳过: {xml_path.name}")
-        return
+        # 报告不早于 XML 才跳过；XML 重新导出过则重新生成
+        if out_html.stat().st_mtime >= xml_path.stat().st_mtime:
+            print(f"⏩ 已存在报告，跳过: {xml_path.name}")
+            return
+        print(f"🔄 XML 比报告新，重新生成: {xml_path.name}")
+    else:
+        print(f"⏳ 正在处理: {xml_path.name}")
 
-    print(f"⏳ 正在处理: {xml_path.name}")
     df, param_cols, metric_cols = parse_xml(str(xml_path))
     generate_report(df, param_cols, metric_cols, str(out_html), file_name=xml_path.name)
 
 
 def main():
+    arg_parser = argparse.ArgumentParser(description="MT5 优化报告生成器")
+    arg_parser.add_argument("xml", nargs="?", help="单个 XML 文件路径；不填则批量处理 mt5_xml 目录")
+    arg_parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                            help="批量模式并行进程数（默认 CPU 核数）")
+    arg_parser.add_argument("--gzip", action="store_true", help="输出 gzip 压缩的 .html.gz 报告")
+    args = arg_parser.parse_args()
+
     base_dir = Path(__file__).parent
 
     # 输入 XML 文件夹：把 MT5 导出的 XML 丢这里
@@ -32,9 +50,9 @@ def main():
     reports_dir.mkdir(exist_ok=True)
 
     # 如果命令行带了参数：兼容单文件模式
-    if len(sys.argv) >= 2:
-        xml_path = Path(sys.argv[1])
-        process_one(xml_path, reports_dir)
+    if args.xml:
+        xml_path = Path(args.xml)
+        process_one(xml_path, reports_dir, compress=args.gzip)
         return
 
     # 不带参数：批量模式
@@ -49,8 +67,16 @@ def main():
         return
 
     print(f"📂 批量模式：扫描 {input_dir}，共发现 {len(xml_files)} 个 XML。")
-    for xml_path in xml_files:
-        process_one(xml_path, reports_dir)
+    workers = max(1, min(args.workers, len(xml_files)))
+    if sys.platform == "win32":
+        workers = min(workers, _WIN_MAX_WORKERS)
+    if workers == 1:
+        for xml_path in xml_files:
+            process_one(xml_path, reports_dir, compress=args.gzip)
+    else:
+        # 每个 XML 相互独立，用多进程并行处理
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            list(ex.map(partial(process_one, reports_dir=reports_dir, compress=args.gzip), xml_files))
 
     print("✅ 全部处理完成。报告已生成在:", reports_dir)
 
@@ -1,73 +1,185 @@
 # parser.py
-import xml.etree.ElementTree as ET
+import xml.etree.ElementTree as StdET
+import numpy as np
 import pandas as pd
 
+# 优先使用 C 实现的 lxml，未安装时退回标准库
+try:
+    from lxml import etree as ET
+except ImportError:
+    ET = StdET
+
 # Excel XML 命名空间
 NS = {"ss": "urn:schemas-microsoft-com:office:spreadsheet"}
 
-
-def try_number(value: str):
-    """尝试把字符串转成数字，否则原样返回"""
-    if value is None:
-        return None
-    value = value.strip()
-    if value == "":
-        return None
-    try:
-        f = float(value)
-        if f.is_integer():
-            return int(f)
-        return f
-    except Exception:
-        return value
+# 预先拼好的完整标签名，流式解析时直接比较字符串
+WORKSHEET_TAG = "{%s}Worksheet" % NS["ss"]
+TABLE_TAG = "{%s}Table" % NS["ss"]
+ROW_TAG = "{%s}Row" % NS["ss"]
+CELL_TAG = "{%s}Cell" % NS["ss"]
+DATA_TAG = "{%s}Data" % NS["ss"]
 
 
-def parse_xml(path: str):
+def _convert_numeric(df: pd.DataFrame) -> pd.DataFrame:
     """
-    解析 MT5 优化导出的 XML（Excel 2003 XML 格式）
-    返回: df, param_cols, metric_cols
+    按列把字符串批量转成数字：整列都能转换的才转换，否则保留原文本
+    空字符串视为缺失；全部为整数且不超过 2**53 的列转为 int64
+    """
+    for name in df.columns:
+        raw = df[name].str.strip()
+        raw = raw.mask(raw == "")
+        converted = pd.to_numeric(raw, errors="coerce")
+        if converted.notna().sum() < raw.notna().sum():
+            df[name] = raw
+            continue
+        # 只有在 float64 能精确表示的整数范围内才转 int64，超大值（如 DBL_MAX）保留为浮点
+        if (
+            converted.dtype.kind == "f"
+            and converted.notna().all()
+            and (converted % 1 == 0).all()
+            and converted.abs().max() <= 2 ** 53
+        ):
+            converted = converted.astype("int64")
+        df[name] = converted
+    return df
+
+
+def _downcast_numeric(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    数值列压缩为更小的类型以减少内存：整数列取能容纳的最小整型；
+    浮点列仅在 float32 能原样表示全部取值时才降级，避免报告中出现精度误差
     """
-    tree = ET.parse(path)
-    root = tree.getroot()
+    for name in df.select_dtypes("integer").columns:
+        df[name] = pd.to_numeric(df[name], downcast="integer")
+    for name in df.select_dtypes("float").columns:
+        col = df[name]
+        narrow = col.astype(np.float32)
+        if ((narrow.astype(np.float64) == col) | col.isna()).all():
+            df[name] = narrow
+    return df
 
-    ws = root.find(".//ss:Worksheet", NS)
-    if ws is None:
-        raise RuntimeError("XML 中未找到 Worksheet 节点")
 
-    table = ws.find("ss:Table", NS)
-    if table is None:
-        raise RuntimeError("Worksheet 中未找到 Table 节点")
+def _iter_rows_lxml(f, found: dict):
+    """
+    lxml 快速路径：只让 Worksheet / Table / Row 的 end 事件进入 Python，
+    Cell、Data 的解析全部留在 C 层完成
+    """
+    table = None
+    for _, elem in ET.iterparse(f, events=("end",), tag=(WORKSHEET_TAG, TABLE_TAG, ROW_TAG)):
+        tag = elem.tag
+        if tag == WORKSHEET_TAG:
+            found["worksheet"] = True
+            break
+        if tag == TABLE_TAG:
+            found["table"] = True
+            continue
 
-    rows = table.findall("ss:Row", NS)
-    if len(rows) < 2:
-        raise RuntimeError("Table 行数不足，至少需要表头 + 一行数据")
+        parent = elem.getparent()
+        if table is None and parent.tag == TABLE_TAG:
+            table = parent
+        if parent is not table:
+            continue
+        found["table"] = True
+
+        yield elem
+
+        # 已处理的行从 Table 中移除，保持内存占用恒定
+        elem.clear()
+        while elem.getprevious() is not None:
+            del table[0]
+
+
+def _iter_rows_std(f, found: dict):
+    """标准库路径：逐个事件判断，只处理第一个 Worksheet 下的 Table"""
+    table = None
+    for event, elem in StdET.iterparse(f, events=("start", "end")):
+        tag = elem.tag
+        if event == "start":
+            if tag == WORKSHEET_TAG:
+                found["worksheet"] = True
+            elif tag == TABLE_TAG and table is None:
+                table = elem
+                found["table"] = True
+            continue
 
-    # 表头
-    headers = []
-    header_cells = rows[0].findall("ss:Cell", NS)
-    for c in header_cells:
-        data = c.find("ss:Data", NS)
-        headers.append(data.text if data is not None else None)
-
-    # 数据行
-    records = []
-    for row in rows[1:]:
-        cells = row.findall("ss:Cell", NS)
-        if not cells:
+        if tag == WORKSHEET_TAG:
+            break
+        if tag != ROW_TAG or table is None:
             continue
 
-        values = []
-        for cell in cells:
-            data = cell.find("ss:Data", NS)
-            text = data.text if data is not None else None
-            values.append(try_number(text))
+        yield elem
+
+        # 已处理的行从 Table 中移除，保持内存占用恒定
+        elem.clear()
+        del table[:]
+
+
+def _read_rows(path: str, iter_rows):
+    """
+    用给定的行迭代器流式读取第一个 Worksheet 的 Table，逐行读取后立即释放
+    返回: headers, columns, row_count, ws_found, table_found
+    """
+    headers = None
+    columns = []
+    row_count = 0
+    found = {"worksheet": False, "table": False}
+
+    with open(path, "rb") as f:
+        for row in iter_rows(f, found):
+            values = []
+            for cell in row:
+                if cell.tag != CELL_TAG:
+                    continue
+                text = None
+                for data in cell:
+                    if data.tag == DATA_TAG:
+                        text = data.text
+                        break
+                values.append(text)
+
+            row_count += 1
+            if headers is None:
+                # 表头：每个表头对应一个列表，按列收集数据
+                headers = values
+                columns = [[] for _ in headers]
+            elif values:
+                # 数据行：超出表头的单元格忽略，不足的补 None
+                n_values = len(values)
+                for i, col in enumerate(columns):
+                    col.append(values[i] if i < n_values else None)
+
+    return headers, columns, row_count, found["worksheet"], found["table"]
+
 
-        if len(values) < len(headers):
-            values += [None] * (len(headers) - len(values))
+def parse_xml(path: str):
+    """
+    解析 MT5 优化导出的 XML（Excel 2003 XML 格式），已去掉交易次数为 0 的行
+    返回: df, param_cols, metric_cols
+    """
+    if ET is StdET:
+        headers, columns, row_count, ws_found, table_found = _read_rows(path, _iter_rows_std)
+    else:
+        try:
+            headers, columns, row_count, ws_found, table_found = _read_rows(path, _iter_rows_lxml)
+        except SyntaxError:
+            # lxml 遇到超大文本节点等情况会报 XMLSyntaxError，退回标准库重试
+            headers, columns, row_count, ws_found, table_found = _read_rows(path, _iter_rows_std)
+
+    if not ws_found:
+        raise RuntimeError("XML 中未找到 Worksheet 节点")
+    if not table_found:
+        raise RuntimeError("Worksheet 中未找到 Table 节点")
+    if row_count < 2:
+        raise RuntimeError("Table 行数不足，至少需要表头 + 一行数据")
 
-        records.append(dict(zip(headers, values)))
+    df = pd.DataFrame(dict(zip(headers, columns)), dtype=object)
+    df = _convert_numeric(df)
+    df = _downcast_numeric(df)
 
-    df = pd.DataFrame(records)
+    # 过滤掉交易次数为 0 的回测，后续分析都不需要这些行
+    if "Trades" in df.columns:
+        trades = pd.to_numeric(df["Trades"], errors="coerce").fillna(0)
+        df = df.loc[trades > 0].reset_index(drop=True)
 
     # 参数列：以 inp 开头
     param_cols = [c for c in df.columns if isinstance(c, str) and c.startswith("inp")]
@@ -2,7 +2,10 @@
 import pandas as pd
 import numpy as np
 import json
-from jinja2 import Template
+import gzip
+import io
+import os
+from jinja2 import Environment
 from datetime import datetime
 
 # 英文列名 -> 中文显示名
@@ -48,41 +51,46 @@ METRIC_DEF = {
     "expected_payoff": ("Expected Payoff", "z_expected_payoff", "预期收益"),
 }
 
+# 帕累托候选行广播比较时，每块最多比较的单元数
+_PARETO_BLOCK_CELLS = 1 << 22
 
-def zscore(series: pd.Series):
-    """Z 分数，标准差为 0 时返回 0"""
-    s = pd.to_numeric(series, errors="coerce")
-    std = s.std()
-    if std == 0 or np.isnan(std):
-        return pd.Series(0.0, index=s.index)
-    return (s - s.mean()) / std
 
 def format_step(value):
     """智能格式化步长，消除浮点误差，如 0.020000000000000018 → 0.02"""
     if value is None:
         return None
-
-    # 尝试保留合适的小数位（最多 8 位）
-    for digits in range(0, 9):
-        v = round(value, digits)
-        if abs(v - value) < 1e-10:
-            return v
-
-    # 如果全部失败，就保留 6 位
-    return round(value, 6)
+    # 保留 12 位有效数字即可去掉浮点尾差；整数步长保持为整数
+    if isinstance(value, int):
+        return value
+    return float(f"{value:.12g}")
 
 def add_z_scores(df: pd.DataFrame) -> pd.DataFrame:
-    """为存在的指标列添加 z_xxx 列"""
-    df = df.copy()
-    for key, (col, zcol, _) in METRIC_DEF.items():
-        if col in df.columns:
-            df[zcol] = zscore(df[col])
+    """
+    为存在的指标列添加 z_xxx 列（原地修改并返回）
+    所有指标一次性按矩阵计算；标准差为 0 的列及缺失值记为 0
+    """
+    present = [(col, zcol) for col, zcol, _ in METRIC_DEF.values() if col in df.columns]
+    if not present:
+        return df
+
+    cols = [col for col, _ in present]
+    sub = df[cols].apply(pd.to_numeric, errors="coerce")
+    m = sub.to_numpy(dtype=np.float64)
+    means = sub.mean().to_numpy(dtype=np.float64)
+    stds = sub.std().to_numpy(dtype=np.float64, copy=True)
+
+    invalid = (stds == 0) | np.isnan(stds)
+    stds[invalid] = 1.0
+    z = (m - means) / stds
+    z[:, invalid] = 0.0
+    z[np.isnan(z)] = 0.0
+
+    df[[zcol for _, zcol in present]] = z.astype(np.float32)
     return df
 
 
 def compute_default_score(df: pd.DataFrame) -> pd.DataFrame:
-    """用默认权重算一遍初始 Score_Weighted（用于智能建议）"""
-    df = df.copy()
+    """用默认权重算一遍初始 Score_Weighted（用于智能建议，原地修改并返回）"""
     score = pd.Series(0.0, index=df.index)
 
     for key, weight in DEFAULT_WEIGHTS.items():
@@ -90,10 +98,38 @@ def compute_default_score(df: pd.DataFrame) -> pd.DataFrame:
         if zcol in df.columns:
             score += weight * df[zcol]
 
-    df["Score_Weighted"] = score
+    df["Score_Weighted"] = score.astype(np.float32)
     return df
 
 
+def _numeric_array(df: pd.DataFrame, col: str) -> np.ndarray:
+    """取出数值列为 float64 数组，列不存在或无法转换时按 0 处理"""
+    if col not in df.columns:
+        return np.zeros(len(df), dtype=np.float64)
+    return pd.to_numeric(df[col], errors="coerce").fillna(0).to_numpy(dtype=np.float64)
+
+
+def _dominated_by(p, s, d, idx, ref):
+    """
+    判断已排序数组中 idx 各行是否被 ref 中排在它之前的某行支配
+    广播比较按块进行，每块不超过 _PARETO_BLOCK_CELLS 个单元
+    """
+    dominated = np.zeros(idx.size, dtype=np.bool_)
+    if idx.size == 0 or ref.size == 0:
+        return dominated
+    block = max(1, _PARETO_BLOCK_CELLS // ref.size)
+    for start in range(0, idx.size, block):
+        rows = idx[start:start + block]
+        cols = ref[:np.searchsorted(ref, rows[-1])]
+        p_c, s_c, d_c = p[rows, None], s[rows, None], d[rows, None]
+        p_j, s_j, d_j = p[None, cols], s[None, cols], d[None, cols]
+        dominated[start:start + block] = (
+            (p_j >= p_c) & (s_j >= s_c) & (d_j <= d_c)
+            & ((p_j > p_c) | (s_j > s_c) | (d_j < d_c))
+        ).any(axis=1)
+    return dominated
+
+
 def compute_pareto(df: pd.DataFrame):
     """
     计算帕累托前沿（基于 Profit ↑, Sharpe ↑, Drawdown ↓）
@@ -103,30 +139,33 @@ def compute_pareto(df: pd.DataFrame):
     if n == 0:
         return pd.Series(False, index=df.index)
 
-    profit = pd.to_numeric(df.get("Profit", 0), errors="coerce").fillna(0)
-    sharpe = pd.to_numeric(df.get("Sharpe Ratio", 0), errors="coerce").fillna(0)
-    dd = pd.to_numeric(df.get("Equity DD %", 0), errors="coerce").fillna(0)
-
-    is_pareto = np.ones(n, dtype=bool)
-
-    for i in range(n):
-        if not is_pareto[i]:
-            continue
-        p_i, s_i, d_i = profit.iloc[i], sharpe.iloc[i], dd.iloc[i]
-        for j in range(n):
-            if i == j:
-                continue
-            p_j, s_j, d_j = profit.iloc[j], sharpe.iloc[j], dd.iloc[j]
-            # j 支配 i
-            if (
-                (p_j >= p_i)
-                and (s_j >= s_i)
-                and (d_j <= d_i)
-                and ((p_j > p_i) or (s_j > s_i) or (d_j < d_i))
-            ):
-                is_pareto[i] = False
-                break
-
+    profit = _numeric_array(df, "Profit")
+    sharpe = _numeric_array(df, "Sharpe Ratio")
+    dd = _numeric_array(df, "Equity DD %")
+
+    # 按 Profit ↓, Sharpe ↓, Drawdown ↑ 排序：能支配某行的记录一定排在它前面
+    order = np.lexsort((dd, -sharpe, -profit))
+    p_s, s_s, d_s = profit[order], sharpe[order], dd[order]
+
+    # 前缀（不含自身）的最大夏普 / 最小回撤：
+    # 若本行夏普比前面都高，或回撤比前面都低，则不可能被支配
+    sharpe_best = np.empty(n)
+    sharpe_best[0] = -np.inf
+    sharpe_best[1:] = np.maximum.accumulate(s_s)[:-1]
+    dd_min = np.empty(n)
+    dd_min[0] = np.inf
+    dd_min[1:] = np.minimum.accumulate(d_s)[:-1]
+    is_pareto_sorted = (s_s > sharpe_best) | (d_s < dd_min)
+
+    # 其余候选行先与已确定的前沿解比较，仍无法确定的再与排在它前面的全部行比较
+    candidates = np.flatnonzero(~is_pareto_sorted)
+    dominated = _dominated_by(p_s, s_s, d_s, candidates, np.flatnonzero(is_pareto_sorted))
+    candidates = candidates[~dominated]
+    dominated = _dominated_by(p_s, s_s, d_s, candidates, np.arange(n))
+    is_pareto_sorted[candidates[~dominated]] = True
+
+    is_pareto = np.empty(n, dtype=np.bool_)
+    is_pareto[order] = is_pareto_sorted
     return pd.Series(is_pareto, index=df.index)
 
 
@@ -151,15 +190,16 @@ def build_suggestion_cards(df: pd.DataFrame, param_cols):
         })
         return cards
 
-    profit = pd.to_numeric(df.get("Profit", 0), errors="coerce").fillna(0)
-    sharpe = pd.to_numeric(df.get("Sharpe Ratio", 0), errors="coerce").fillna(0)
-    dd = pd.to_numeric(df.get("Equity DD %", 0), errors="coerce").fillna(0)
-    trades = pd.to_numeric(df.get("Trades", 0), errors="coerce").fillna(0)
+    profit = _numeric_array(df, "Profit")
+    sharpe = _numeric_array(df, "Sharpe Ratio")
+    dd = _numeric_array(df, "Equity DD %")
+    trades = _numeric_array(df, "Trades")
 
     # 1. 激进型：利润最大（简单过滤）
     mask_aggr = (trades >= 10)
-    df_aggr = df[mask_aggr] if mask_aggr.any() else df
-    row_aggr = df_aggr.loc[profit[df_aggr.index].idxmax()]
+    if not mask_aggr.any():
+        mask_aggr[:] = True
+    row_aggr = df.iloc[int(np.argmax(np.where(mask_aggr, profit, -np.inf)))]
     cards.append({
         "title": "1. 激进型策略（追求高利润）",
         "body": f"""
@@ -170,7 +210,7 @@ def build_suggestion_cards(df: pd.DataFrame, param_cols):
     })
 
     # 2. 平衡型：综合评分最高（默认权重）
-    row_bal = df.sort_values("Score_Weighted", ascending=False).iloc[0]
+    row_bal = df.iloc[int(np.argmax(_numeric_array(df, "Score_Weighted")))]
     cards.append({
         "title": "2. 平衡型策略（风险收益平衡）",
         "body": f"""
@@ -182,9 +222,9 @@ def build_suggestion_cards(df: pd.DataFrame, param_cols):
 
     # 3. 保守型：利润>0 & 夏普>0 中回撤最小
     mask_cons = (profit > 0) & (sharpe > 0)
-    df_cons = df[mask_cons] if mask_cons.any() else df
-    dd_cons = dd[df_cons.index]
-    row_cons = df_cons.loc[dd_cons.idxmin()]
+    if not mask_cons.any():
+        mask_cons[:] = True
+    row_cons = df.iloc[int(np.argmin(np.where(mask_cons, dd, np.inf)))]
     cards.append({
         "title": "3. 保守型策略（低回撤优先）",
         "body": f"""
@@ -220,6 +260,43 @@ def build_suggestion_cards(df: pd.DataFrame, param_cols):
     return cards
 
 
+def build_param_ranges(df: pd.DataFrame, param_cols):
+    """每个参数的最小值、最大值与步长（参数范围表用）"""
+    param_ranges = []
+    for p in param_cols:
+        col = pd.to_numeric(df[p], errors="coerce")
+        # np.unique 已排好序；步长取相邻取值的最小差，不依赖前两个值
+        # 先放宽到 64 位再求差，避免 int8/int16 等窄类型相减溢出
+        vals = np.unique(col.dropna().to_numpy())
+        vals = vals.astype(np.result_type(vals, np.int64))
+        step = format_step(np.diff(vals).min().item()) if vals.size >= 2 else 0
+
+        param_ranges.append({
+            "name": p[3:] if p.startswith("inp") else p,
+            "min": vals[0] if vals.size else None,
+            "max": vals[-1] if vals.size else None,
+            "step": step
+        })
+    return param_ranges
+
+
+def build_param_groups(df: pd.DataFrame, param_cols):
+    """
+    预先按每个参数取值分组，计算各 z 列的平均值
+    前端只需按当前权重线性组合：score_avg = Σ w_k * mean(z_k)
+    返回: {param: {"x": [...], "z_means": {zcol: [...]}}}
+    """
+    zcols = [zcol for _, zcol, _ in METRIC_DEF.values() if zcol in df.columns]
+    groups = {}
+    for p in param_cols:
+        grouped = df.groupby(p)[zcols].mean().astype(np.float64).round(6)
+        groups[p] = {
+            "x": grouped.index.tolist(),
+            "z_means": {zcol: grouped[zcol].tolist() for zcol in zcols},
+        }
+    return groups
+
+
 def generate_report(df: pd.DataFrame, param_cols, metric_cols, output_path: str, file_name: str):
     """
     生成报告：
@@ -229,13 +306,9 @@ def generate_report(df: pd.DataFrame, param_cols, metric_cols, output_path: str,
     - 参数 vs 综合评分（平均）的折线图（前端绘制，可重算）
     - 排行表（前端按当前权重重排，默认前 30 条；帕累托解标绿色）
     """
+    # 交易次数为 0 的行已在 parse_xml 中过滤；这里复制一份，后续步骤原地加列
     df = df.copy()
 
-    # 过滤掉交易次数为 0 的
-    if "Trades" in df.columns:
-        trades = pd.to_numeric(df["Trades"], errors="coerce").fillna(0)
-        df = df[trades > 0]
-
     # 添加 z 分数列
     df = add_z_scores(df)
 
@@ -254,23 +327,7 @@ def generate_report(df: pd.DataFrame, param_cols, metric_cols, output_path: str,
     pareto_count = int(pareto_flag.sum())
     analyze_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     # ==== 参数范围 & 步长 ====
-    param_ranges = []
-    for p in param_cols:
-        col = pd.to_numeric(df[p], errors="coerce")
-        vals = sorted(col.dropna().unique())
-        if len(vals) >= 2:
-            raw_step = vals[1] - vals[0]
-            step = format_step(raw_step)
-        else:
-            step = 0
-
-        param_ranges.append({
-            "name": p[3:] if p.startswith("inp") else p,
-            "min": vals[0] if len(vals) > 0 else None,
-            "max": vals[-1] if len(vals) > 0 else None,
-            "step": step
-        })
-
+    param_ranges = build_param_ranges(df, param_cols)
 
     # 建议卡片
     suggestion_cards = build_suggestion_cards(df, param_cols)
@@ -284,13 +341,12 @@ def generate_report(df: pd.DataFrame, param_cols, metric_cols, output_path: str,
 
     # ======== 前端需要的数据 ========
 
-    # rawData：每行包含参数、原始指标、z_xxx、初始 Score_Weighted、Is_Pareto
-    raw_records = df.to_dict(orient="records")
-    raw_json = json.dumps(raw_records, ensure_ascii=False)
-
     # paramCols
     param_cols_json = json.dumps(param_cols, ensure_ascii=False)
 
+    # paramGroups：每个参数各取值下 z_xxx 的平均值（参数敏感性图用）
+    param_groups_json = json.dumps(build_param_groups(df, param_cols), ensure_ascii=False)
+
     # metricsConfig：只保留确实存在的指标
     metrics_config = {}
     for key, (col, zcol, label) in METRIC_DEF.items():
@@ -317,11 +373,61 @@ def generate_report(df: pd.DataFrame, param_cols, metric_cols, output_path: str,
     table_cols.append("Score_Weighted")
     table_cols_json = json.dumps(table_cols, ensure_ascii=False)
 
+    # rawData：只保留前端用到的列（参数、z_xxx、排行表列、Is_Pareto）
+    # 直接由 pandas 按列序列化，避免先生成逐行的 dict 列表
+    needed = set(param_cols) | {zcol for _, zcol, _ in METRIC_DEF.values()} | set(table_cols) | {"Is_Pareto"}
+    df_out = df[[c for c in df.columns if c in needed]].astype({"Is_Pareto": "int8"})
+    raw_json = df_out.to_json(orient="records", force_ascii=False, double_precision=6)
+
     # 排行默认显示前 N 条
     rank_top_n = 30
 
-    # ===== HTML 模板（Bootstrap + 前端 Plotly）=====
-    html_template = """
+    context = dict(
+        file_name=file_name,
+        analyze_time=analyze_time,
+        param_count=param_count,
+        total_runs=total_runs,
+        valid_count=valid_count,
+        pareto_count=pareto_count,
+        suggestion_cards=suggestion_cards,
+        default_weights_text=default_weights_text,
+        raw_json=raw_json,
+        param_cols_json=param_cols_json,
+        param_groups_json=param_groups_json,
+        metrics_config_json=metrics_config_json,
+        default_weights_json=default_weights_json,
+        display_name_map_json=display_name_map_json,
+        table_cols_json=table_cols_json,
+        param_cols=param_cols,
+        rank_top_n=rank_top_n,
+        param_ranges=param_ranges,
+    )
+
+    # 分块渲染并写入，不在内存中拼出整份 HTML；输出路径以 .gz 结尾时 gzip 压缩
+    # 先写到临时文件，完整写完后再替换，中途中断不会留下残缺的报告
+    tmp_path = output_path + ".tmp"
+    try:
+        if output_path.endswith(".gz"):
+            # gzip 头里记录去掉 .gz 的报告名，而不是临时文件名
+            with open(tmp_path, "wb") as raw:
+                gz = gzip.GzipFile(filename=os.path.basename(output_path)[:-3], mode="wb",
+                                   fileobj=raw, compresslevel=6)
+                with io.TextIOWrapper(gz, encoding="utf-8") as f:
+                    _TPL.stream(**context).dump(f)
+        else:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                _TPL.stream(**context).dump(f)
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    print("🎉 HTML 报告生成成功：", output_path)
+
+
+# ===== HTML 模板（Bootstrap + 前端 Plotly）=====
+_HTML_TEMPLATE = """
 <!doctype html>
 <html lang="zh-CN">
   <head>
@@ -526,6 +632,7 @@ def generate_report(df: pd.DataFrame, param_cols, metric_cols, output_path: str,
     <script>
       const rawData = {{ raw_json | safe }};
       const paramCols = {{ param_cols_json | safe }};
+      const paramGroups = {{ param_groups_json | safe }};
       const metricsConfig = {{ metrics_config_json | safe }};
       let weights = {{ default_weights_json | safe }};
       const displayNameMap = {{ display_name_map_json | safe }};
@@ -596,26 +703,22 @@ def generate_report(df: pd.DataFrame, param_cols, metric_cols, output_path: str,
 
 
       // 构建参数敏感性图：每个参数 vs score 平均值
+      // 分组均值已在 Python 端算好，这里只按当前权重线性组合
       function buildParamCharts() {
         paramCols.forEach((param, idx) => {
-          const grouped = {};
-          rawData.forEach(row => {
-            const v = row[param];
-            if (v === undefined || v === null) return;
-            const key = String(v);
-            if (!grouped[key]) grouped[key] = [];
-            grouped[key].push(row.score);
-          });
+          const group = paramGroups[param];
+          if (!group) return;
 
-          const xs = [];
-          const ys = [];
-          const keys = Object.keys(grouped).sort((a, b) => parseFloat(a) - parseFloat(b));
-          keys.forEach(k => {
-            const arr = grouped[k];
-            const avg = arr.reduce((sum, val) => sum + val, 0) / arr.length;
-            xs.push(parseFloat(k));
-            ys.push(avg);
-          });
+          const xs = group.x;
+          const ys = xs.map(() => 0);
+          for (const [key, cfg] of Object.entries(metricsConfig)) {
+            const w = weights[key] || 0;
+            const zMeans = group.z_means[cfg.zcol];
+            if (!zMeans) continue;
+            zMeans.forEach((z, i) => {
+              ys[i] += w * z;
+            });
+          }
 
           const divId = 'param-chart-' + idx;
           const titleName = param.startsWith('inp') ? param.slice(3) : param;
@@ -661,7 +764,7 @@ def generate_report(df: pd.DataFrame, param_cols, metric_cols, output_path: str,
         html += '</tr></thead><tbody>';
 
         rowsToShow.forEach(row => {
-          const isPareto = row["Is_Pareto"] === true || row["Is_Pareto"] === 1 || row["Is_Pareto"] === "True";
+          const isPareto = row["Is_Pareto"] === 1;
           const trClass = isPareto ? ' class="table-success"' : '';
           html += '<tr' + trClass + '>';
           tableColumns.forEach(col => {
@@ -732,28 +835,6 @@ def generate_report(df: pd.DataFrame, param_cols, metric_cols, output_path: str,
 </html>
     """
 
-    tpl = Template(html_template)
-    final_html = tpl.render(
-        file_name=file_name,
-        analyze_time=analyze_time,
-        param_count=param_count,
-        total_runs=total_runs,
-        valid_count=valid_count,
-        pareto_count=pareto_count,
-        suggestion_cards=suggestion_cards,
-        default_weights_text=default_weights_text,
-        raw_json=raw_json,
-        param_cols_json=param_cols_json,
-        metrics_config_json=metrics_config_json,
-        default_weights_json=default_weights_json,
-        display_name_map_json=display_name_map_json,
-        table_cols_json=table_cols_json,
-        param_cols=param_cols,
-        rank_top_n=rank_top_n,
-        param_ranges=param_ranges,
-    )
-
-    with open(output_path, "w", encoding="utf-8") as f:
-        f.write(final_html)
-
-    print("🎉 HTML 报告生成成功：", output_path)
+# 模板只在导入时编译一次，批量生成报告时复用
+_ENV = Environment(autoescape=False)
+_TPL = _ENV.from_string(_HTML_TEMPLATE)
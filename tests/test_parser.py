@@ -0,0 +1,92 @@
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import parser
+from parser import _convert_numeric, _iter_rows_lxml, _iter_rows_std, _read_rows, parse_xml
+
+WORKBOOK = """<?xml version="1.0"?>
+<Workbook xmlns="urn:schemas-microsoft-com:office:spreadsheet"
+xmlns:ss="urn:schemas-microsoft-com:office:spreadsheet">
+{body}
+</Workbook>
+"""
+
+# 行间注释、空单元格、缺 Data 的单元格、短行、超长行、空行，以及应被忽略的第二个 Worksheet
+EDGE_CASE_BODY = """<Worksheet ss:Name="Tester Optimizator Results">
+<Table>
+<Row>
+<Cell><Data ss:Type="String">Profit</Data></Cell>
+<Cell><Data ss:Type="String">Trades</Data></Cell>
+<Cell><Data ss:Type="String">inpA</Data></Cell>
+</Row>
+<!-- comment between rows -->
+<Row><Cell><Data ss:Type="Number">1.5</Data></Cell><Cell><Data ss:Type="Number"></Data></Cell><Cell><Data ss:Type="Number">3</Data></Cell></Row>
+<Row><Cell><Data ss:Type="Number">2</Data></Cell></Row>
+<Row></Row>
+<Row><Cell/><Cell><Data ss:Type="Number">7</Data></Cell><Cell><Data ss:Type="Number">8</Data></Cell><Cell><Data ss:Type="Number">9</Data></Cell></Row>
+</Table>
+</Worksheet>
+<Worksheet ss:Name="Other">
+<Table>
+<Row><Cell><Data ss:Type="String">ignored</Data></Cell></Row>
+</Table>
+</Worksheet>"""
+
+
+def test_convert_numeric_keeps_huge_integers_as_float():
+    """超出 int64 精确范围的整数值（如 DBL_MAX）不能被转成 int64 而溢出"""
+    df = pd.DataFrame({
+        "Custom": ["1.7976931348623157e308", "0"],
+        "Big": ["1e20", "1"],
+        "Trades": ["10", "20"],
+    }, dtype=object)
+    df = _convert_numeric(df)
+
+    assert df["Custom"].dtype == "float64"
+    assert df["Custom"].iloc[0] == 1.7976931348623157e308
+    assert df["Big"].dtype == "float64"
+    assert df["Big"].iloc[0] == 1e20
+    assert df["Trades"].dtype == "int64"
+
+
+def _write(tmp_path, body, name="book.xml"):
+    path = tmp_path / name
+    path.write_text(WORKBOOK.format(body=body), encoding="utf-8")
+    return str(path)
+
+
+def test_lxml_and_stdlib_readers_agree(tmp_path):
+    """lxml 快速路径与标准库回退路径读取结果必须完全一致"""
+    pytest.importorskip("lxml")
+    path = _write(tmp_path, EDGE_CASE_BODY)
+
+    fast = _read_rows(path, _iter_rows_lxml)
+    std = _read_rows(path, _iter_rows_std)
+
+    assert fast == std
+    headers, columns, row_count, ws_found, table_found = std
+    assert headers == ["Profit", "Trades", "inpA"]
+    assert columns == [["1.5", "2", None], [None, None, "7"], ["3", None, "8"]]
+    assert (row_count, ws_found, table_found) == (5, True, True)
+
+
+@pytest.mark.parametrize("use_stdlib", [False, True])
+@pytest.mark.parametrize("body, message", [
+    ("", "未找到 Worksheet"),
+    ('<Worksheet ss:Name="x"></Worksheet>', "未找到 Table"),
+    ('<Worksheet ss:Name="x"><Table>'
+     '<Row><Cell><Data ss:Type="String">Profit</Data></Cell></Row>'
+     '</Table></Worksheet>', "行数不足"),
+])
+def test_parse_xml_structure_errors(tmp_path, monkeypatch, use_stdlib, body, message):
+    """缺少 Worksheet / Table 或行数不足时报错，两种解析后端一致"""
+    if use_stdlib:
+        monkeypatch.setattr(parser, "ET", parser.StdET)
+    path = _write(tmp_path, body)
+    with pytest.raises(RuntimeError, match=message):
+        parse_xml(path)
@@ -0,0 +1,126 @@
+import gzip
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from parser import parse_xml
+import report
+from report import build_param_ranges, compute_pareto, generate_report
+
+XML_TEMPLATE = """<?xml version="1.0"?>
+<Workbook xmlns="urn:schemas-microsoft-com:office:spreadsheet"
+xmlns:ss="urn:schemas-microsoft-com:office:spreadsheet">
+<Worksheet ss:Name="Tester Optimizator Results">
+<Table>
+<Row>
+<Cell><Data ss:Type="String">Profit</Data></Cell>
+<Cell><Data ss:Type="String">Trades</Data></Cell>
+<Cell><Data ss:Type="String">inpA</Data></Cell>
+<Cell><Data ss:Type="String">inpB</Data></Cell>
+</Row>
+{rows}
+</Table>
+</Worksheet>
+</Workbook>
+"""
+
+ROW_TEMPLATE = (
+    '<Row><Cell><Data ss:Type="Number">{profit}</Data></Cell>'
+    '<Cell><Data ss:Type="Number">10</Data></Cell>'
+    '<Cell><Data ss:Type="Number">{a}</Data></Cell>'
+    '<Cell><Data ss:Type="Number">{b}</Data></Cell></Row>'
+)
+
+
+def test_param_ranges_wide_integer_gap(tmp_path):
+    """窄整型参数列的步长不能因溢出变成负数"""
+    rows = "\n".join(
+        ROW_TEMPLATE.format(profit=i, a=a, b=b)
+        for i, (a, b) in enumerate([(-100, -20000), (100, 20000)])
+    )
+    path = tmp_path / "wide.xml"
+    path.write_text(XML_TEMPLATE.format(rows=rows), encoding="utf-8")
+
+    df, param_cols, _ = parse_xml(str(path))
+    ranges = {r["name"]: r for r in build_param_ranges(df, param_cols)}
+
+    assert ranges["A"]["step"] == 200
+    assert ranges["B"]["step"] == 40000
+    assert isinstance(ranges["A"]["step"], int)
+    assert (ranges["A"]["min"], ranges["A"]["max"]) == (-100, 100)
+    assert (ranges["B"]["min"], ranges["B"]["max"]) == (-20000, 20000)
+
+
+def _make_report_df():
+    return pd.DataFrame({
+        "Profit": [100.0, 50.0, -20.0],
+        "Sharpe Ratio": [1.5, 2.0, -0.5],
+        "Equity DD %": [10.0, 5.0, 20.0],
+        "Trades": [30, 20, 10],
+        "inpPeriod": [10, 20, 30],
+    })
+
+
+def test_gzip_report_stores_html_name(tmp_path):
+    """gzip 头中的原始文件名应为 .html，而不是临时文件名"""
+    out = tmp_path / "Report-1.html.gz"
+    generate_report(_make_report_df(), ["inpPeriod"], [], str(out), file_name="Report-1.xml")
+
+    raw = out.read_bytes()
+    assert raw[:2] == b"\x1f\x8b"
+    assert raw[3] & 0x08  # FNAME 标志位
+    fname = raw[10:raw.index(b"\x00", 10)]
+    assert fname == b"Report-1.html"
+    assert "Report-1.xml" in gzip.decompress(raw).decode("utf-8")
+    assert not (tmp_path / "Report-1.html.gz.tmp").exists()
+
+
+def _brute_pareto(df):
+    """原 O(n²) 两两比较实现，作为帕累托前沿的参考结果"""
+    p = pd.to_numeric(df["Profit"], errors="coerce").fillna(0).to_numpy()
+    s = pd.to_numeric(df["Sharpe Ratio"], errors="coerce").fillna(0).to_numpy()
+    d = pd.to_numeric(df["Equity DD %"], errors="coerce").fillna(0).to_numpy()
+    n = len(df)
+    is_pareto = np.ones(n, dtype=bool)
+    for i in range(n):
+        for j in range(n):
+            if i == j:
+                continue
+            if (
+                p[j] >= p[i] and s[j] >= s[i] and d[j] <= d[i]
+                and (p[j] > p[i] or s[j] > s[i] or d[j] < d[i])
+            ):
+                is_pareto[i] = False
+                break
+    return is_pareto
+
+
+def _random_pareto_frames(seed, count):
+    """取值范围很小的随机数据，保证大量并列与重复行，部分带 NaN"""
+    rng = np.random.default_rng(seed)
+    for _ in range(count):
+        n = int(rng.integers(1, 60))
+        data = {
+            col: rng.integers(0, 5, n).astype(float)
+            for col in ["Profit", "Sharpe Ratio", "Equity DD %"]
+        }
+        df = pd.DataFrame(data, index=rng.permutation(n) + 100)
+        if rng.random() < 0.3:
+            df = df.mask(rng.random(df.shape) < 0.1)
+        yield df
+
+
+@pytest.mark.parametrize("block_cells", [None, 7])
+def test_compute_pareto_matches_brute_force(monkeypatch, block_cells):
+    """与两两比较的参考实现一致；block_cells 很小时走多块比较路径"""
+    if block_cells is not None:
+        monkeypatch.setattr(report, "_PARETO_BLOCK_CELLS", block_cells)
+    for df in _random_pareto_frames(seed=0, count=200):
+        got = compute_pareto(df)
+        assert got.index.equals(df.index)
+        np.testing.assert_array_equal(got.to_numpy(), _brute_pareto(df))